@@ -1,40 +1,147 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignKey
+from fastapi import FastAPI, Body, Depends, HTTPException, Query, Request, Response
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.decorator import cache
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from cachetools import TTLCache
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DDL, inspect, column, select, insert, update, case, event, lambda_stmt, bindparam
+from sqlalchemy import text as sql_text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, async_scoped_session, AsyncSession
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
-from pydantic import BaseModel
-from typing import List, Optional
+from sqlalchemy.orm import relationship, raiseload
+from pydantic import BaseModel, Field, AliasChoices
+from typing import List, Optional, Union
+from asyncio import current_task, gather
+from contextlib import asynccontextmanager
+import os
+import logging
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# Debug mode turns unplanned lazy loads into errors instead of hidden extra queries
+DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true")
 
 # Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///social_media.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Postgres behind PgBouncer (port 6432); set DATABASE_URL=sqlite+aiosqlite:///social_media.db for local runs
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://user:pw@pgbouncer:6432/social")
+if SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
+    # PgBouncer in transaction mode can't keep prepared statements across transactions,
+    # so turn off asyncpg's statement caches and give each prepared statement a unique name
+    connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+else:
+    connect_args = {}
+engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args=connect_args,
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+)
+SessionLocal = async_scoped_session(
+    async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False),
+    scopefunc=current_task,
+)
+
+# WAL lets readers proceed while a writer holds the lock; synchronous is per-connection.
+# foreign_keys makes SQLite reject unknown user_ids like Postgres does
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+
+# Response cache setup
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+CACHE_PREFIX = "cache"
+redis_client = aioredis.from_url(REDIS_URL)
+# Opt-in in-process cache of single users/posts (with their ETag) by id, for single-process deployments.
+# Writes only evict it in the worker that handled them, so leave it off when running several workers
+OBJECT_CACHE = os.getenv("OBJECT_CACHE", "").lower() in ("1", "true")
+object_cache = TTLCache(maxsize=10_000, ttl=60) if OBJECT_CACHE else None
 
 Base = declarative_base()
 
 # SQLAlchemy models
 class UserDB(Base):
     __tablename__ = "users"
+    # Never reuse ids on SQLite, so an (id, version) ETag can't match a different row
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, index=True)
     is_admin = Column(Boolean, default=False)
     image_url = Column(String)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     posts = relationship("PostDB", back_populates="user")
 
 class PostDB(Base):
     __tablename__ = "posts"
+    # Never reuse ids on SQLite, so an (id, version) ETag can't match a different row
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     post_text = Column(String)
     likes = Column(Integer, default=0)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     user = relationship("UserDB", back_populates="posts")
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# create_all doesn't alter existing tables, so add the ETag version column to databases created before it
+@event.listens_for(Base.metadata, "after_create")
+def add_missing_version_columns(target, connection, **kw):
+    inspector = inspect(connection)
+    for table in ("users", "posts"):
+        if "version" not in {col["name"] for col in inspector.get_columns(table)}:
+            connection.execute(sql_text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
+# On SQLite, title search goes through an FTS5 trigram index kept in sync with posts by triggers
+POSTS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts "
+    "USING fts5(title, content='posts', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, title) VALUES (new.id, new.title); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title) VALUES ('delete', old.id, old.title); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+    "INSERT INTO posts_fts(rowid, title) VALUES (new.id, new.title); END",
+)
+
+# Runs after every create_all, so databases created before these indexes existed pick them up at startup
+@event.listens_for(Base.metadata, "after_create")
+def create_search_indexes(target, connection, **kw):
+    connection.execute(sql_text("CREATE INDEX IF NOT EXISTS ix_posts_user_id ON posts (user_id)"))
+    if connection.dialect.name == "postgresql":
+        # Trigram index so title LIKE '%...%' searches can use an index
+        connection.execute(sql_text("CREATE INDEX IF NOT EXISTS ix_posts_title_trgm ON posts USING gin (title gin_trgm_ops)"))
+    elif connection.dialect.name == "sqlite":
+        fts_exists = connection.execute(sql_text("SELECT 1 FROM sqlite_master WHERE name = 'posts_fts'")).first()
+        for ddl in POSTS_FTS_DDL:
+            connection.execute(sql_text(ddl))
+        # A new FTS table starts empty; index the posts that are already there
+        if fts_exists is None:
+            connection.execute(sql_text("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')"))
+
+# Per-id lookups built once as lambda statements so each call reuses the cached compiled SQL
+get_user_stmt = lambda_stmt(lambda: select(UserDB).where(UserDB.id == bindparam("user_id")))
+get_post_stmt = lambda_stmt(lambda: select(PostDB).where(PostDB.id == bindparam("post_id")))
 
 # Pydantic models
 class UserBase(BaseModel):
@@ -46,6 +153,8 @@ class UserCreate(UserBase):
     pass
 
 class User(UserBase):
+    # UserDB stores the name as username; accept either when validating from attributes
+    name: str = Field(validation_alias=AliasChoices("name", "username"))
     id: int
     class Config:
         from_attributes = True
@@ -63,165 +172,301 @@ class Post(PostBase):
     likes: int = 0
     class Config:
         from_attributes = True
+
+# Keyset-paginated list responses; pass next_cursor back as ?cursor= for the next page
+MAX_PAGE_SIZE = 200
+
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[int] = None
+
+class PostPage(BaseModel):
+    items: List[Post]
+    next_cursor: Optional[int] = None
        
-app = FastAPI()
+# Create tables
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+# Open pool_size connections up front so the first requests don't pay for connection setup;
+# close() hands them back to the pool rather than disconnecting
+async def warm_pool():
+    conns = await gather(*(engine.connect().start() for _ in range(engine.pool.size())))
+    await gather(*(conn.close() for conn in conns))
+
+def init_cache():
+    FastAPICache.init(RedisBackend(redis_client), prefix=CACHE_PREFIX)
+
+@asynccontextmanager
+async def lifespan(app):
+    await create_tables()
+    await warm_pool()
+    init_cache()
+    yield
+    await engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
+
+# Cache GET responses per URL so the injected db session doesn't end up in the key
+def request_key_builder(func, namespace="", *, request=None, response=None, args=(), kwargs=None):
+    return f"{namespace}:{request.url.path}?{request.url.query}"
+
+# Drop cached responses after a write; the write is already committed, so a Redis outage is logged, not raised.
+# The in-process entry is evicted first so it can't outlive a failed Redis call
+async def invalidate_cache(namespace, object_key=None):
+    if object_cache is not None and object_key is not None:
+        object_cache.pop(object_key, None)
+    try:
+        # SCAN + UNLINK rather than FastAPICache.clear, whose KEYS script blocks Redis while it walks the keyspace
+        keys = [key async for key in redis_client.scan_iter(match=f"{CACHE_PREFIX}:{namespace}:*", count=1000)]
+        if keys:
+            await redis_client.unlink(*keys)
+    except RedisError:
+        logger.warning("Could not clear cache namespace %r", namespace, exc_info=True)
+
+# Weak ETag for a row; version is bumped by every PUT/PATCH so it changes with the content
+def make_etag(row_id, version):
+    return f'W/"{row_id}-{version}"'
+
+# If-None-Match may list several tags or "*"; tags are compared weakly, ignoring the W/ prefix (RFC 9110)
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
 
 # Dependency to get database session
-def get_db():
+async def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await SessionLocal.remove()
 
 # User Endpoints
 
 @app.post("/users/", response_model=User)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = UserDB(username=user.name, is_admin=user.is_admin, image_url=user.image_url)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return User(id=db_user.id, name=db_user.username, is_admin=db_user.is_admin, image_url=db_user.image_url)
-
-@app.get("/users/", response_model=List[User])
-async def get_users(name: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(UserDB)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    stmt = (
+        insert(UserDB)
+        .values(username=user.name, is_admin=user.is_admin, image_url=user.image_url)
+        .returning(UserDB.id, UserDB.username, UserDB.is_admin, UserDB.image_url)
+    )
+    row = (await db.execute(stmt)).one()
+    await db.commit()
+    await invalidate_cache("users")
+    return User.model_validate(row)
+
+@app.get("/users/", response_model=Union[List[User], UserPage])
+@cache(expire=30, namespace="users", key_builder=request_key_builder)
+async def get_users(
+    name: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    # User doesn't serialize posts, so don't load them; raiseload makes an accidental access fail instead of querying
+    query = select(UserDB).options(raiseload(UserDB.posts))
+    if DEBUG:
+        query = query.options(raiseload("*"))
     if name:
-        query = query.filter(UserDB.username.contains(name))
-    users = query.all()
-    return [User(id=user.id, name=user.username, is_admin=user.is_admin, image_url=user.image_url) for user in users]
+        query = query.where(UserDB.username.contains(name))
+    if cursor is not None:
+        query = query.where(UserDB.id > cursor)
+    query = query.order_by(UserDB.id).limit(limit or MAX_PAGE_SIZE)
+    users = [User.model_validate(user) for user in (await db.scalars(query)).all()]
+    # Without a limit keep the plain list response, capped at MAX_PAGE_SIZE
+    if limit is None:
+        return users
+    return UserPage(items=users, next_cursor=users[-1].id if len(users) == limit else None)
 
 @app.get("/users/{user_id}", response_model=User)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = db.query(UserDB).filter(UserDB.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return User(id=db_user.id, name=db_user.username, is_admin=db_user.is_admin, image_url=db_user.image_url)
+async def get_user(user_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    cached_user = object_cache.get(("user", user_id)) if object_cache is not None else None
+    if cached_user is None:
+        db_user = (await db.execute(get_user_stmt, {"user_id": user_id})).scalar_one_or_none()
+        if db_user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        cached_user = (User.model_validate(db_user), make_etag(db_user.id, db_user.version))
+        if object_cache is not None:
+            object_cache[("user", user_id)] = cached_user
+    user, etag = cached_user
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return user
 
 @app.put("/users/{user_id}", response_model=User)
-async def update_user(user_id: int, user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(UserDB).filter(UserDB.id == user_id).first()
+async def update_user(user_id: int, user: UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = (await db.execute(get_user_stmt, {"user_id": user_id})).scalar_one_or_none()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     db_user.username = user.name
     db_user.is_admin = user.is_admin
     db_user.image_url = user.image_url
-    db.commit()
-    db.refresh(db_user)
-    return User(id=db_user.id, name=db_user.username, is_admin=db_user.is_admin, image_url=db_user.image_url)
+    db_user.version = UserDB.version + 1
+    await db.commit()
+    await invalidate_cache("users", ("user", user_id))
+    await db.refresh(db_user)
+    return User.model_validate(db_user)
 
 @app.patch("/users/{user_id}/name", response_model=User)
-async def patch_user_name(user_id: int, name: str, db: Session = Depends(get_db)):
-    db_user = db.query(UserDB).filter(UserDB.id == user_id).first()
-    if db_user is None:
+async def patch_user_name(user_id: int, name: str, db: AsyncSession = Depends(get_db)):
+    stmt = (
+        update(UserDB)
+        .where(UserDB.id == user_id)
+        .values(username=name, version=UserDB.version + 1)
+        .returning(UserDB.id, UserDB.username, UserDB.is_admin, UserDB.image_url)
+        .execution_options(synchronize_session=False)
+    )
+    row = (await db.execute(stmt)).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="User not found")
-    db_user.username = name
-    db.commit()
-    db.refresh(db_user)
-    return User(id=db_user.id, name=db_user.username, is_admin=db_user.is_admin, image_url=db_user.image_url)
+    await db.commit()
+    await invalidate_cache("users", ("user", user_id))
+    return User.model_validate(row)
 
 # Post Endpoints
 
-@app.post("/posts/", response_model=Post)
-async def create_post(post: PostCreate, db: Session = Depends(get_db)):
-    db_post = PostDB(**post.dict())
-    db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
-    return db_post
+# Apply a column update as one UPDATE ... RETURNING instead of load, modify, commit, refresh
+async def patch_post(db: AsyncSession, post_id: int, **values) -> Post:
+    stmt = (
+        update(PostDB)
+        .where(PostDB.id == post_id)
+        .values(**values, version=PostDB.version + 1)
+        .returning(PostDB.id, PostDB.title, PostDB.post_text, PostDB.user_id, PostDB.likes)
+        .execution_options(synchronize_session=False)
+    )
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    await db.commit()
+    await invalidate_cache("posts", ("post", post_id))
+    return Post.model_validate(row)
 
 @app.post("/posts/", response_model=Post)
-async def create_post(post: PostCreate, db: Session = Depends(get_db)):
-    db_post = PostDB(title=post.title, post_text=post.text, user_id=post.user_id)
-    db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
-    return Post(id=db_post.id, title=db_post.title, post_text=db_post.post_text, user_id=db_post.user_id, likes=db_post.likes)
-
-@app.get("/posts/", response_model=List[Post])
-async def get_posts(title: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(PostDB)
+async def create_post(post: PostCreate, db: AsyncSession = Depends(get_db)):
+    stmt = (
+        insert(PostDB)
+        .values(**post.model_dump())
+        .returning(PostDB.id, PostDB.title, PostDB.post_text, PostDB.user_id, PostDB.likes)
+    )
+    try:
+        row = (await db.execute(stmt)).one()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="User not found")
+    await invalidate_cache("posts")
+    return Post.model_validate(row)
+
+# Insert many posts as one executemany and a single commit; batches are capped like list pages
+@app.post("/posts/bulk", response_model=List[Post])
+async def create_posts_bulk(
+    posts: List[PostCreate] = Body(..., max_length=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    if not posts:
+        return []
+    stmt = insert(PostDB).returning(
+        PostDB.id, PostDB.title, PostDB.post_text, PostDB.user_id, PostDB.likes, sort_by_parameter_order=True
+    )
+    try:
+        rows = (await db.execute(stmt, [post.model_dump() for post in posts])).all()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="User not found")
+    await invalidate_cache("posts")
+    return [Post.model_validate(row) for row in rows]
+
+@app.get("/posts/", response_model=Union[List[Post], PostPage])
+@cache(expire=30, namespace="posts", key_builder=request_key_builder)
+async def get_posts(
+    title: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    # Post doesn't serialize its user, so don't load it; raiseload makes an accidental access fail instead of querying
+    query = select(PostDB).options(raiseload(PostDB.user))
+    if DEBUG:
+        query = query.options(raiseload("*"))
     if title:
-        query = query.filter(PostDB.title.contains(title))
-    posts = query.all()
-    return [Post(id=post.id, title=post.title, post_text=post.post_text, user_id=post.user_id, likes=post.likes) for post in posts]
+        # The trigram tokenizer only matches terms of 3+ characters; shorter ones fall back to LIKE
+        if engine.dialect.name == "sqlite" and len(title) >= 3:
+            fts_match = sql_text("SELECT rowid FROM posts_fts WHERE posts_fts MATCH :term").bindparams(
+                term='"' + title.replace('"', '""') + '"'
+            )
+            query = query.where(PostDB.id.in_(fts_match.columns(column("rowid", Integer))))
+        else:
+            query = query.where(PostDB.title.contains(title))
+    if cursor is not None:
+        query = query.where(PostDB.id > cursor)
+    query = query.order_by(PostDB.id).limit(limit or MAX_PAGE_SIZE)
+    posts = [Post.model_validate(post) for post in (await db.scalars(query)).all()]
+    # Without a limit keep the plain list response, capped at MAX_PAGE_SIZE
+    if limit is None:
+        return posts
+    return PostPage(items=posts, next_cursor=posts[-1].id if len(posts) == limit else None)
 
 @app.get("/posts/{post_id}", response_model=Post)
-async def get_post(post_id: int, db: Session = Depends(get_db)):
-    db_post = db.query(PostDB).filter(PostDB.id == post_id).first()
-    if db_post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
-    return Post(id=db_post.id, title=db_post.title, post_text=db_post.post_text, user_id=db_post.user_id, likes=db_post.likes)
+async def get_post(post_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    cached_post = object_cache.get(("post", post_id)) if object_cache is not None else None
+    if cached_post is None:
+        db_post = (await db.execute(get_post_stmt, {"post_id": post_id})).scalar_one_or_none()
+        if db_post is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        cached_post = (Post.model_validate(db_post), make_etag(db_post.id, db_post.version))
+        if object_cache is not None:
+            object_cache[("post", post_id)] = cached_post
+    post, etag = cached_post
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return post
 
 @app.put("/posts/{post_id}", response_model=Post)
-async def update_post(post_id: int, post: PostCreate, db: Session = Depends(get_db)):
-    db_post = db.query(PostDB).filter(PostDB.id == post_id).first()
+async def update_post(post_id: int, post: PostCreate, db: AsyncSession = Depends(get_db)):
+    db_post = (await db.execute(get_post_stmt, {"post_id": post_id})).scalar_one_or_none()
     if db_post is None:
         raise HTTPException(status_code=404, detail="Post not found")
     db_post.title = post.title
-    db_post.post_text = post.text
+    db_post.post_text = post.post_text
     db_post.user_id = post.user_id
-    db.commit()
-    db.refresh(db_post)
-    return Post(id=db_post.id, title=db_post.title, post_text=db_post.post_text, user_id=db_post.user_id, likes=db_post.likes)
+    db_post.version = PostDB.version + 1
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="User not found")
+    await invalidate_cache("posts", ("post", post_id))
+    await db.refresh(db_post)
+    return Post.model_validate(db_post)
 
 @app.patch("/posts/{post_id}/text", response_model=Post)
-async def patch_post_text(post_id: int, text: str, db: Session = Depends(get_db)):
-    db_post = db.query(PostDB).filter(PostDB.id == post_id).first()
-    if db_post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
-    db_post.post_text = text
-    db.commit()
-    db.refresh(db_post)
-    return Post(id=db_post.id, title=db_post.title, post_text=db_post.post_text, user_id=db_post.user_id, likes=db_post.likes)
+async def patch_post_text(post_id: int, text: str, db: AsyncSession = Depends(get_db)):
+    return await patch_post(db, post_id, post_text=text)
 
 @app.patch("/posts/{post_id}/likes/increment", response_model=Post)
-async def increment_post_likes(post_id: int, db: Session = Depends(get_db)):
-    db_post = db.query(PostDB).filter(PostDB.id == post_id).first()
-    if db_post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
-    db_post.likes += 1
-    db.commit()
-    db.refresh(db_post)
-    return db_post
+async def increment_post_likes(post_id: int, db: AsyncSession = Depends(get_db)):
+    return await patch_post(db, post_id, likes=PostDB.likes + 1)
 
 @app.patch("/posts/{post_id}/likes/decrement", response_model=Post)
-async def decrement_post_likes(post_id: int, db: Session = Depends(get_db)):
-    db_post = db.query(PostDB).filter(PostDB.id == post_id).first()
-    if db_post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
-    db_post.likes = max(0, db_post.likes - 1)
-    db.commit()
-    db.refresh(db_post)
-    return db_post
+async def decrement_post_likes(post_id: int, db: AsyncSession = Depends(get_db)):
+    return await patch_post(db, post_id, likes=case((PostDB.likes > 0, PostDB.likes - 1), else_=0))
 
 @app.delete("/posts/{post_id}", response_model=Post)
-async def delete_post(post_id: int, db: Session = Depends(get_db)):
-    db_post = db.query(PostDB).filter(PostDB.id == post_id).first()
+async def delete_post(post_id: int, db: AsyncSession = Depends(get_db)):
+    db_post = (await db.execute(get_post_stmt, {"post_id": post_id})).scalar_one_or_none()
     if db_post is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    db.delete(db_post)
-    db.commit()
+    await db.delete(db_post)
+    await db.commit()
+    await invalidate_cache("posts", ("post", post_id))
     return db_post
 
-@app.get("/users/", response_model=List[User ])
-async def get_users(username: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(UserDB)
-    if username:
-        query = query.filter(UserDB.username.contains(username))
-    print(query.all())  
-    return query.all()
-
-@app.get("/users/", response_model=List[User ])
-async def get_users(username: Optional[str] = None, db: Session = Depends(get_db)):
-        query = db.query(UserDB)
-        if username:
-            query = query.filter(UserDB.username.contains(username))
-        print(query.all())
-        
-        return query.all()
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="localhost", port=8000, reload=True)